@@ -0,0 +1,92 @@
+"""Import-time benchmark for the notebook backend modules.
+
+Each module is imported in a fresh interpreter, timed, and checked against the heavy GUI, plotting and
+analysis packages it must not pull in at import time. Exits with a non-zero status on any regression so it
+can guard the headless acquisition and batch-conversion workers:
+
+    python benchmark_imports.py
+    python benchmark_imports.py --repeat 5 --max-seconds 1.5
+"""
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+
+HEAVY_MODULES = ['mne', 'psychopy', 'matplotlib', 'seaborn', 'sklearn', 'pyriemann', 'pyglet']
+
+
+# module -> heavy modules that are allowed to be loaded when importing it
+ALLOWED_HEAVY = {
+    'utils': [],
+    'replay': [],
+    'dataset': [],
+    'experiments': [],
+    'time_frequency': [],
+}
+
+
+_PROBE = """
+import sys, json
+from time import perf_counter
+t = perf_counter()
+import {module}
+elapsed = perf_counter() - t
+heavy = {heavy}
+print(json.dumps({{'seconds': elapsed,
+                   'loaded': [m for m in heavy if m in sys.modules]}}))
+"""
+
+
+def time_import(module, repeat=3):
+    """Imports a module in fresh interpreters and returns the best import time and the heavy modules loaded
+
+    Parameters:
+        module (str): name of the module to import
+        repeat (int): number of interpreters to run
+
+    Returns:
+        seconds
+        loaded
+    """
+    code = _PROBE.format(module=module, heavy=repr(HEAVY_MODULES))
+    here = os.path.dirname(os.path.abspath(__file__))
+    best, loaded = None, []
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, '-c', code], cwd=here, capture_output=True, text=True)
+        if out.returncode != 0:
+            raise RuntimeError(f'Importing {module} failed:\n{out.stderr}')
+        result = json.loads(out.stdout.strip().splitlines()[-1])
+        if best is None or result['seconds'] < best:
+            best = result['seconds']
+        loaded = result['loaded']
+    return best, loaded
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('modules', nargs='*', default=list(ALLOWED_HEAVY))
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--max-seconds', type=float, default=None,
+                        help='fail if any module takes longer than this to import')
+    args = parser.parse_args()
+
+    failed = False
+    for module in args.modules:
+        seconds, loaded = time_import(module, args.repeat)
+        unexpected = [m for m in loaded if m not in ALLOWED_HEAVY.get(module, [])]
+        status = 'ok'
+        if unexpected:
+            status = 'FAIL: loads ' + ', '.join(unexpected)
+            failed = True
+        elif args.max_seconds is not None and seconds > args.max_seconds:
+            status = f'FAIL: slower than {args.max_seconds:.2f}s'
+            failed = True
+        print(f'{module:<16} {seconds * 1000:8.1f} ms  {status}')
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
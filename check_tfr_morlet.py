@@ -0,0 +1,81 @@
+"""Numerical check of time_frequency.tfr_morlet against mne.time_frequency.tfr_morlet.
+
+Both are run on the same synthetic epochs and the power and inter-trial coherence are compared
+with np.testing.assert_allclose. Exits with a non-zero status on the first mismatch:
+
+    python check_tfr_morlet.py
+"""
+import sys
+
+import numpy as np
+import mne
+from mne.time_frequency import tfr_morlet as mne_tfr_morlet
+
+from time_frequency import tfr_morlet, clear_wavelet_cache
+from utils import OPENBCI_STANDARD_16
+
+
+SFREQ = 250.
+FREQS = np.logspace(1, 1.75, 20)
+
+
+# name -> (keyword arguments, rtol)
+CASES = {
+    'float64': (dict(n_cycles=15), 1e-7),
+    'float32': (dict(n_cycles=15, dtype=np.float32), 1e-3),
+    'chunked frequencies': (dict(n_cycles=15, chunk_size=7), 1e-7),
+    'chunked epochs': (dict(n_cycles=15, memory_budget=1e5), 1e-7),
+    'decim': (dict(n_cycles=15, decim=3), 1e-7),
+    'decim slice': (dict(n_cycles=15, decim=slice(10, None, 2)), 1e-7),
+    'picks eeg': (dict(n_cycles=15, picks='eeg'), 1e-7),
+    'per-frequency n_cycles': (dict(n_cycles=FREQS / 2.), 1e-7),
+}
+
+
+def make_epochs(n_epochs=12, seed=42):
+    """Synthetic 16 channel epochs with phase-locked 20 Hz and 33 Hz components on top of noise, plus a stim
+    channel that the default picks must leave out
+    """
+    rng = np.random.RandomState(seed)
+    times = np.arange(-0.5, 4., 1. / SFREQ)
+    signal = np.sin(2 * np.pi * 20. * times) + 0.5 * np.sin(2 * np.pi * 33. * times)
+    data = rng.randn(n_epochs, len(OPENBCI_STANDARD_16) + 1, len(times)) + signal
+    data[:, -1] = 0.
+    ch_types = ['eeg'] * len(OPENBCI_STANDARD_16) + ['stim']
+    info = mne.create_info(OPENBCI_STANDARD_16 + ['STI'], SFREQ, ch_types)
+    return mne.EpochsArray(data * 1e-6, info, tmin=times[0], verbose=False)
+
+
+def check_case(epochs, kwargs, rtol):
+    kwargs = dict(kwargs)
+    mne_kwargs = {key: kwargs[key] for key in ('n_cycles', 'decim', 'picks') if key in kwargs}
+    expected = mne_tfr_morlet(epochs, FREQS, use_fft=True, return_itc=True, zero_mean=True,
+                              verbose=False, **mne_kwargs)
+    n_cycles = kwargs.pop('n_cycles')
+    actual = tfr_morlet(epochs, FREQS, n_cycles, return_itc=True, zero_mean=True, **kwargs)
+
+    for name, exp, act in zip(('power', 'itc'), expected, actual):
+        np.testing.assert_allclose(act.times, exp.times)
+        assert act.ch_names == exp.ch_names, name
+        np.testing.assert_allclose(act.data, exp.data, rtol=rtol,
+                                   atol=rtol * np.abs(exp.data).max(), err_msg=name)
+
+
+def main():
+    epochs = make_epochs()
+    failed = False
+    for name, (kwargs, rtol) in CASES.items():
+        clear_wavelet_cache()
+        try:
+            check_case(epochs, kwargs, rtol)
+            status = 'ok'
+        except AssertionError as err:
+            status = 'FAIL\n' + str(err)
+            failed = True
+        print(f'{name:<24} {status}')
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
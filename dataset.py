@@ -2,13 +2,6 @@ import os
 import numpy as np
 import pandas as pd
 
-from mne import create_info, concatenate_raws, pick_types, Epochs
-from mne.io import RawArray
-from mne.io.edf import read_raw_edf
-from mne.datasets import eegbci
-from mne.event import find_events
-from mne.channels import make_standard_montage
-
 from brainflow.board_shim import BoardShim, BoardIds
 from brainflow.data_filter import DataFilter, FilterTypes, AggOperations
 
@@ -124,6 +117,9 @@ class brainflowDataset:
         return stim_array
 
     def _add_stim_to_raw(self, raw, stim_data, ch_name):
+        from mne import create_info
+        from mne.io import RawArray
+
         info = create_info([ch_name], raw.info['sfreq'], ['stim'])
         stim_raw = RawArray(stim_data, info)
         raw.add_channels([stim_raw], force_update_info=True)
@@ -196,6 +192,11 @@ class brainflowDataset:
         return data
 
     def bci_to_raw(self, data):
+        # MNE is only imported when Raw objects are created, so loading sessions as arrays stays lightweight
+        from mne import create_info
+        from mne.io import RawArray
+        from mne.channels import make_standard_montage
+
         eeg_data = data[self.eeg_info[0], :]
         ch_types = ['eeg'] * len(self.eeg_info[0])
         #montage = make_standard_montage('standard_1005')
@@ -219,7 +220,28 @@ class brainflowDataset:
         raw = self._add_stim_to_raw(raw, stims, 'STI')
         return raw
 
+    def load_session_to_array(self, subject_name, run, preprocess=False):
+        """Loads a single session as numpy arrays without creating any MNE objects.
+
+        Parameters:
+            subject_name
+            run
+            preprocess
+
+        Returns:
+            eeg_data
+            stims
+        """
+        data, events = self._load_session_data(subject_name, run)
+        data = self._scale_eeg_data(data)
+        stims = self._create_stim_array(data, events)
+        if preprocess:
+            data = self.preprocess_eeg(data)
+        return data[self.eeg_info[0], :], stims
+
     def load_subject_to_raw(self, subject_name, runs, preprocess=True):
+        from mne import concatenate_raws
+
         raws = []
         for run in runs:
             raws.append(self.load_session_to_raw(subject_name, run, preprocess))
@@ -6,11 +6,11 @@ from random import choice
 
 import numpy as np
 from pandas import DataFrame
-from psychopy import visual, core, event
 
 from brainflow import DataFilter, BoardShim, BoardIds, BrainFlowInputParams
 
 from utils import get_fns, get_openbci_usb, get_openbci_ip
+from replay import replayBoard
 
 
 def get_board_info(board_type, usb_port=None, ip_addr=None, ip_port=None, serial_num=None):
@@ -57,6 +57,54 @@ def get_board_info(board_type, usb_port=None, ip_addr=None, ip_port=None, serial
     return board_id, params
 
 
+def get_board(board_id, params, replay_fns=None, replay_speed=1.0):
+    """Creates the board used for streaming. If the file names of a recorded session are given, the session is
+    replayed from disk through a replayBoard instead of connecting to the headset.
+
+    Parameters:
+        board_id (int): brainflow board id
+        params (BrainFlowInputParams): connection parameters
+        replay_fns (tuple): data and event file names of the session to replay, as returned by get_fns
+        replay_speed (float or None): replay rate relative to real time, None for no throttling
+
+    Returns:
+        board
+    """
+    if replay_fns is not None:
+        data_fn, event_fn = replay_fns
+        return replayBoard(data_fn, event_fn, board_id=board_id, speed=replay_speed)
+    return BoardShim(board_id, params)
+
+
+def board_sleep(board, seconds):
+    """Waits for `seconds` of data to be streamed by the board. For a replayBoard this follows the replay speed,
+    for live boards it is the same as time.sleep.
+    """
+    if isinstance(board, replayBoard):
+        board.sleep(seconds)
+    else:
+        sleep(seconds)
+
+
+def board_time(board):
+    """Current time on the board's timeline. For a replayBoard this is the timestamp of the latest streamed sample,
+    which advances at the replay speed, for live boards it is the wall clock.
+    """
+    if isinstance(board, replayBoard):
+        return board.time()
+    return time()
+
+
+def check_not_replayed(board, data_fn, event_fn):
+    """Raises a ValueError if saving a session to data_fn/event_fn would overwrite the session being replayed"""
+    if not isinstance(board, replayBoard):
+        return
+    replayed = {os.path.abspath(fn) for fn in (board.data_fn, board.event_fn) if fn}
+    if {os.path.abspath(data_fn), os.path.abspath(event_fn)} & replayed:
+        raise ValueError(f'Recording to {data_fn} would overwrite the replayed session, '
+                         'use a different subject name or run number')
+
+
 def get_possible_ssvep_freqs(frame_rate, stim_type='single'):
     """ This function takes the frame rate of the monitor in use and returns the possible SSVEP
     stimulus frequencies based on the desired stimulus type.
@@ -112,9 +160,11 @@ class freeRecording:
         self.board = None
         self._setup_session(activity)
 
-    def initialize_eeg(self, board_type='synthetic', usb_port=None, ip_addr=None, ip_port=None, serial_num=None):
+    def initialize_eeg(self, board_type='synthetic', usb_port=None, ip_addr=None, ip_port=None, serial_num=None,
+                       replay=None, replay_speed=1.0):
         self.board_id, self.params = get_board_info(board_type, usb_port, ip_addr, ip_port, serial_num)
-        self.board = BoardShim(self.board_id, self.params)
+        replay_fns = get_fns(*replay, self.session_name) if replay else None
+        self.board = get_board(self.board_id, self.params, replay_fns, replay_speed)
         self.board.prepare_session()
         self.board_prepared = True
 
@@ -125,22 +175,23 @@ class freeRecording:
         self.session_name = activity
 
     def record(self, duration, subject, run):
+        data_fn, event_fn = get_fns(subject, run, self.session_name)
+        check_not_replayed(self.board, data_fn, event_fn)
         if self.board_prepared == False:
             self.board.prepare_session()
             self.board_prepared = True
 
         print("Beginning EEG Stream; Wait 5 seconds for signal to settle... \n")
         self.board.start_stream()
-        sleep(5)
+        board_sleep(self.board, 5)
 
         print(f"Starting recording for {duration} seconds... \n")
-        sleep(duration)
+        board_sleep(self.board, duration)
 
         # cleanup the session
         self.board.stop_stream()
         # self.board_prepared = False
         data = self.board.get_board_data()
-        data_fn, event_fn = get_fns(subject, run, self.session_name)
         DataFilter.write_file(data, data_fn, 'w')
 
 
@@ -155,9 +206,11 @@ class eventRelatedPotential:
         self.max_trials = 500
         self._setup_trial()
 
-    def initialize_eeg(self, board_type='synthetic', usb_port=None, ip_addr=None, ip_port=None, serial_num=None):
+    def initialize_eeg(self, board_type='synthetic', usb_port=None, ip_addr=None, ip_port=None, serial_num=None,
+                       replay=None, replay_speed=1.0):
         self.board_id, self.params = get_board_info(board_type, usb_port, ip_addr, ip_port, serial_num)
-        self.board = BoardShim(self.board_id, self.params)
+        replay_fns = get_fns(*replay, self.erp) if replay else None
+        self.board = get_board(self.board_id, self.params, replay_fns, replay_speed)
         self.board.prepare_session()
         self.board_prepared = True
 
@@ -179,6 +232,9 @@ class eventRelatedPotential:
             self.markers = [1, 2]
 
     def _setup_graphics(self):
+        # psychopy is imported on first use so that headless recording never loads the GUI stack
+        from psychopy import visual
+
         self.mywin = visual.Window([3440, 1440], monitor='testMonitor', units="deg")
         if self.erp == 'n170':
             faces = list(map(self._load_image, glob('stim/face_house/faces/*_3.jpg')))
@@ -190,9 +246,15 @@ class eventRelatedPotential:
             self.stim = [nontargets, targets]
 
     def _load_image(self, fn):
+        from psychopy import visual
+
         return visual.ImageStim(win=self.mywin, image=fn)
 
     def run_trial(self, duration, subject, run):
+        from psychopy import core, event
+
+        data_fn, event_fn = get_fns(subject, run, self.erp)
+        check_not_replayed(self.board, data_fn, event_fn)
         if self.board_prepared == False:
             self.board.prepare_session()
             self.board_prepared = True
@@ -203,7 +265,7 @@ class eventRelatedPotential:
         record_duration = np.float32(duration)
         print("Beginning EEG Stream; Wait 5 seconds for signal to settle... \n")
         self.board.start_stream()
-        sleep(5)
+        board_sleep(self.board, 5)
 
         # Get starting time-stamp by pulling the last sample from the board and using its time stamp
         last_sample = self.board.get_current_board_data(1)
@@ -228,7 +290,7 @@ class eventRelatedPotential:
             # offset (Off-SET!)
             core.wait(soa)
             self.mywin.flip()
-            if len(event.getKeys()) > 0 or (time() - start) > record_duration:
+            if len(event.getKeys()) > 0 or (board_time(self.board) - start) > record_duration:
                 break
 
             event.clearEvents()
@@ -237,7 +299,6 @@ class eventRelatedPotential:
         self.board.stop_stream()
         #self.board_prepared = False
         data = self.board.get_board_data()
-        data_fn, event_fn = get_fns(subject, run, self.erp)
         DataFilter.write_file(data, data_fn, 'w')
         self.mywin.close()
         self.trials.to_csv(event_fn)
@@ -253,10 +314,12 @@ class steadyStateEvokedPotentials:
         self.max_trials = 500
         self._setup_trials()
 
-    def initialize_eeg(self, board_type='synthetic', usb_port=None, ip_addr=None, ip_port=None, serial_num=None):
+    def initialize_eeg(self, board_type='synthetic', usb_port=None, ip_addr=None, ip_port=None, serial_num=None,
+                       replay=None, replay_speed=1.0):
         BoardShim.enable_dev_board_logger()
         self.board_id, self.params = get_board_info(board_type, usb_port, ip_addr, ip_port, serial_num)
-        self.board = BoardShim(self.board_id, self.params)
+        replay_fns = get_fns(*replay, self.paradigm) if replay else None
+        self.board = get_board(self.board_id, self.params, replay_fns, replay_speed)
         self.board.prepare_session()
 
     def _setup_trials(self):
@@ -265,6 +328,8 @@ class steadyStateEvokedPotentials:
                                      timestamp=np.zeros(self.max_trials)))
 
     def _setup_graphics(self):
+        from psychopy import visual
+
         soa = 3.0
         self.mywin = visual.Window([3440, 1440], monitor='testMonitor', units="deg", wintype='pygame')
         if self.paradigm == 'ssvep':
@@ -278,9 +343,15 @@ class steadyStateEvokedPotentials:
         return grating, grating_neg, stim_patterns
 
     def _load_image(self, fn):
+        from psychopy import visual
+
         return visual.ImageStim(win=self.mywin, image=fn)
 
     def run_trial(self, duration, subject, run):
+        from psychopy import core, event
+
+        data_fn, event_fn = get_fns(subject, run, self.paradigm)
+        check_not_replayed(self.board, data_fn, event_fn)
         # session information
         iti = 0.5
         soa = 3.0
@@ -288,7 +359,7 @@ class steadyStateEvokedPotentials:
         record_duration = np.float32(duration)
         print("Beginning EEG Stream; Wait 5 seconds for signal to settle... \n")
         self.board.start_stream()
-        sleep(5)
+        board_sleep(self.board, 5)
 
         # Get starting time-stamp by pulling the last sample from the board and using its time stamp
         last_sample = self.board.get_current_board_data(1)
@@ -318,7 +389,7 @@ class steadyStateEvokedPotentials:
 
             # Offset
             self.mywin.flip()
-            if len(event.getKeys()) > 0 or (time() - start) > record_duration:
+            if len(event.getKeys()) > 0 or (board_time(self.board) - start) > record_duration:
                 break
 
             event.clearEvents()
@@ -326,7 +397,6 @@ class steadyStateEvokedPotentials:
         # cleanup the session
         self.board.stop_stream()
         data = self.board.get_board_data()
-        data_fn, event_fn = get_fns(subject, run, self.paradigm)
         print(event_fn)
         DataFilter.write_file(data, data_fn, 'w')
         self.mywin.close()
@@ -0,0 +1,194 @@
+import os
+from threading import Thread, Event, Lock, Condition
+from time import time, perf_counter
+
+import numpy as np
+import pandas as pd
+
+from brainflow import DataFilter, BoardShim
+
+
+class replayBoard:
+    """Streams a session previously saved by `run_trial` or `record` as if it came from a live board. Exposes the
+    subset of the BoardShim interface used by the experiments, so it can be used in place of a real headset to
+    exercise the acquisition and online processing paths offline and repeatably.
+
+    Samples are released chunk by chunk at `speed` times real time (None streams as fast as possible) with their
+    original timestamps, and the session's events become available when the stream reaches their timestamp.
+
+    Parameters:
+        data_fn (str): data file written by DataFilter.write_file
+        event_fn (str): matching _EVENTS.csv file, optional
+        board_id (int): id of the board the session was recorded with
+        sfreq (float): sampling frequency, defaults to the sampling rate of board_id
+        speed (float or None): replay rate relative to real time, must be positive. None for no throttling
+        chunk_size (int): number of samples released at once, defaults to ~1/25 s of data
+        rebase_timestamps (bool): shift the timestamps of the samples and events so the stream starts at the current
+            time, as with a live board. The spacing between samples and events is kept as recorded
+    """
+
+    def __init__(self, data_fn, event_fn=None, board_id=None, sfreq=None, speed=1.0, chunk_size=None,
+                 rebase_timestamps=True):
+        self.board_id = board_id
+        self.data_fn = data_fn
+        self.event_fn = event_fn
+        if speed is not None and not speed > 0:
+            raise ValueError('speed must be a positive number or None, got %r' % (speed,))
+        self.speed = speed
+        self.rebase_timestamps = rebase_timestamps
+
+        if sfreq is None:
+            sfreq = BoardShim.get_sampling_rate(board_id)
+        self.sfreq = sfreq
+        self.chunk_size = chunk_size or max(1, int(sfreq / 25))
+
+        self._data = None
+        self._timestamps = None
+        self._events = None
+        self._event_timestamps = None
+        self._offset = None
+        self._read = 0
+        self._write = 0
+        self._buffer_size = None
+        self._lock = Lock()
+        self._advanced = Condition(self._lock)
+        self._stop = Event()
+        self._thread = None
+        self._running = False
+
+    def prepare_session(self):
+        self._data = DataFilter.read_file(self.data_fn)
+        if self.event_fn and os.path.exists(self.event_fn):
+            events = pd.read_csv(self.event_fn, index_col=0)
+            # trials that never ran are left with a zero timestamp
+            events = events[events['timestamp'] >= self._data[-1][0]]
+            self._events = events.sort_values('timestamp')
+            self._event_timestamps = self._events['timestamp'].values.copy()
+        else:
+            self._events = None
+        self._timestamps = self._data[-1].copy()
+        self._offset = None
+        self._read = 0
+        self._write = 0
+
+    def is_prepared(self):
+        return self._data is not None
+
+    def release_session(self):
+        self.stop_stream()
+        self._data = None
+        self._events = None
+
+    def start_stream(self, num_samples=450000):
+        if self._data is None:
+            raise RuntimeError('Session is not prepared, call prepare_session first')
+        self.stop_stream()
+        if self.rebase_timestamps and self._write < self._data.shape[1]:
+            offset = time() - self._timestamps[self._write]
+            # an accelerated stream runs ahead of the wall clock, so after a restart the new offset
+            # can be smaller than the previous one. Keep it monotonic so timestamps keep increasing
+            if self._offset is not None:
+                offset = max(offset, self._offset)
+            self._rebase(offset)
+        self._buffer_size = num_samples
+        self._stop.clear()
+        self._running = True
+        self._thread = Thread(target=self._stream, daemon=True)
+        self._thread.start()
+
+    def _rebase(self, offset):
+        # only samples and events that have not been streamed yet are shifted
+        with self._lock:
+            self._offset = offset
+            pos = self._write
+            self._data[-1, pos:] = self._timestamps[pos:] + offset
+            if self._events is not None:
+                pending = self._event_timestamps >= self._timestamps[pos]
+                timestamps = self._events['timestamp'].values.copy()
+                timestamps[pending] = self._event_timestamps[pending] + offset
+                self._events['timestamp'] = timestamps
+
+    def stop_stream(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+    def _stream(self):
+        n_samples = self._data.shape[1]
+        start_pos = self._write
+        start_time = perf_counter()
+        pos = start_pos
+        while pos < n_samples and not self._stop.is_set():
+            pos = min(pos + self.chunk_size, n_samples)
+            with self._lock:
+                self._write = pos
+                self._read = max(self._read, self._write - self._buffer_size)
+                self._advanced.notify_all()
+
+            if self.speed:
+                target = start_time + (pos - start_pos) / (self.sfreq * self.speed)
+                delay = target - perf_counter()
+                if delay > 0:
+                    self._stop.wait(delay)
+
+        with self._lock:
+            self._running = False
+            self._advanced.notify_all()
+
+    def is_streaming(self):
+        """Returns False once the stream is stopped or every recorded sample has been released"""
+        with self._lock:
+            return self._running
+
+    def sleep(self, seconds):
+        """Blocks until `seconds` of the recording have been streamed, i.e. seconds / speed of wall time, or until
+        the stream ends. Replaces time.sleep for code that waits on the board.
+        """
+        with self._advanced:
+            target = self._write + int(round(seconds * self.sfreq))
+            self._advanced.wait_for(lambda: self._write >= target or not self._running)
+
+    def time(self):
+        """Current time on the replayed timeline: the timestamp of the latest streamed sample. It advances at
+        `speed` times the wall clock, and is infinite once every recorded sample has been streamed so that loops
+        waiting on it end with the recording.
+        """
+        with self._lock:
+            if self._write >= self._data.shape[1]:
+                return float('inf')
+            if self._write == 0:
+                return self._data[-1][0]
+            return self._data[-1][self._write - 1]
+
+    def get_board_data_count(self):
+        with self._lock:
+            return self._write - self._read
+
+    def get_current_board_data(self, num_samples):
+        """Gets the latest num_samples samples without removing them from the buffer"""
+        with self._lock:
+            start = max(self._read, self._write - num_samples)
+            return self._data[:, start:self._write].copy()
+
+    def get_board_data(self):
+        """Gets all buffered samples and removes them from the buffer"""
+        with self._lock:
+            data = self._data[:, self._read:self._write].copy()
+            self._read = self._write
+        return data
+
+    def get_events(self):
+        """Gets the events whose timestamp has been reached by the stream
+
+        Returns:
+            events (pd.DataFrame): rows of the session's _EVENTS.csv, empty if there is none
+        """
+        if self._events is None:
+            return pd.DataFrame(columns=['timestamp'])
+        with self._lock:
+            if self._write == 0:
+                return self._events.iloc[:0].copy()
+            last_timestamp = self._data[-1][self._write - 1]
+            n_events = np.searchsorted(self._events['timestamp'].values, last_timestamp, side='right')
+            return self._events.iloc[:n_events].copy()
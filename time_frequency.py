@@ -0,0 +1,250 @@
+from functools import lru_cache
+
+import numpy as np
+from scipy.fft import fft, ifft, next_fast_len
+
+
+def _as_cycles(freqs, n_cycles):
+    n_cycles = np.broadcast_to(np.asarray(n_cycles, dtype=float), freqs.shape)
+    return tuple(float(c) for c in n_cycles)
+
+
+@lru_cache(maxsize=32)
+def _wavelet_bank(sfreq, freqs, n_cycles, zero_mean):
+    """Builds the complex Morlet wavelets for each frequency. Matches the wavelets used by
+    mne.time_frequency.tfr_morlet, so the result is the same up to floating point error.
+    The bank is cached on (sfreq, freqs, n_cycles, zero_mean).
+
+    Parameters:
+        sfreq (float): sampling frequency
+        freqs (tuple of float): frequencies of interest
+        n_cycles (tuple of float): number of cycles per frequency
+        zero_mean (bool): remove the DC offset of each wavelet
+
+    Returns:
+        Ws (list of np.ndarray)
+    """
+    Ws = []
+    for f, cycles in zip(freqs, n_cycles):
+        sigma_t = cycles / (2.0 * np.pi * f)
+        t = np.arange(0., 5. * sigma_t, 1.0 / sfreq)
+        t = np.r_[-t[::-1], t[1:]]
+        oscillation = np.exp(2.0 * 1j * np.pi * f * t)
+        gaussian_envelope = np.exp(-t ** 2 / (2.0 * sigma_t ** 2))
+        if zero_mean:
+            real_offset = np.exp(- 2 * (np.pi * f * sigma_t) ** 2)
+            oscillation -= real_offset
+        W = oscillation * gaussian_envelope
+        W /= np.sqrt(0.5) * np.linalg.norm(W.ravel())
+        W.flags.writeable = False
+        Ws.append(W)
+    return Ws
+
+
+@lru_cache(maxsize=32)
+def _wavelet_bank_fft(sfreq, freqs, n_cycles, zero_mean, n_times, dtype):
+    """Zero-pads the wavelet bank to a common FFT length for signals of n_times samples and
+    transforms it. Cached next to the bank itself so repeated calls skip this step too.
+
+    Returns:
+        fft_Ws (np.ndarray): (n_freqs, fsize) wavelet spectra
+        widths (np.ndarray): number of samples of each wavelet
+        fsize (int): FFT length
+    """
+    Ws = _wavelet_bank(sfreq, freqs, n_cycles, zero_mean)
+    widths = np.array([W.size for W in Ws])
+    if widths.max() > n_times:
+        raise ValueError('At least one of the wavelets is longer than the signal. '
+                         'Use a longer signal or shorter wavelets.')
+
+    fsize = next_fast_len(n_times + widths.max() - 1)
+    complex_dtype = np.result_type(dtype, np.complex64)
+    fft_Ws = np.empty((len(Ws), fsize), dtype=complex_dtype)
+    for ii, W in enumerate(Ws):
+        fft_Ws[ii] = fft(W.astype(complex_dtype), fsize)
+    fft_Ws.flags.writeable = False
+    return fft_Ws, widths, fsize
+
+
+def clear_wavelet_cache():
+    """Empties the cached wavelet banks
+    """
+    _wavelet_bank.cache_clear()
+    _wavelet_bank_fft.cache_clear()
+
+
+def _check_decim(decim):
+    """Turns decim into a slice of the time axis, accepting a positive int or a slice like mne does"""
+    if isinstance(decim, slice):
+        return decim
+    if isinstance(decim, (int, np.integer)) and not isinstance(decim, bool) and decim > 0:
+        return slice(None, None, int(decim))
+    raise ValueError('decim must be a positive int or a slice, got %r' % (decim,))
+
+
+def _chunk_sizes(n_epochs, n_channels, n_freqs, fsize, itemsize, chunk_size, memory_budget):
+    """Picks how many frequencies and epochs are convolved at once so that the spectra of the
+    block, their product with the wavelets and its inverse transform fit in memory_budget bytes.
+    """
+    # the product and its inverse transform each hold one complex value per FFT bin
+    per_item = 2 * fsize * itemsize
+    n_items = max(1, int(memory_budget // per_item))
+    if chunk_size is not None and (not isinstance(chunk_size, (int, np.integer)) or chunk_size <= 0):
+        raise ValueError('chunk_size must be a positive int or None, got %r' % (chunk_size,))
+    if chunk_size is None:
+        chunk_size = min(n_freqs, max(1, n_items // (n_epochs * n_channels)))
+    epoch_chunk = min(n_epochs, max(1, n_items // (n_channels * chunk_size)))
+    return chunk_size, epoch_chunk
+
+
+def morlet_power_itc(data, sfreq, freqs, n_cycles=7.0, zero_mean=True, return_itc=True,
+                     decim=1, dtype=np.float64, chunk_size=None, memory_budget=256e6, n_jobs=1):
+    """Computes the epoch-averaged Morlet power and inter-trial coherence for every epoch,
+    channel and frequency with batched FFT convolution. Numerically equivalent to
+    mne.time_frequency.tfr_morlet(..., average=True), see check_tfr_morlet.py.
+
+    Parameters:
+        data (np.ndarray): (n_epochs, n_channels, n_times) epoched data
+        sfreq (float): sampling frequency
+        freqs (array-like): frequencies of interest
+        n_cycles (float or array-like): number of cycles, fixed or per frequency
+        zero_mean (bool): use zero-mean wavelets
+        return_itc (bool): also compute the inter-trial coherence
+        decim (int or slice): decimation factor or slice applied to the time axis
+        dtype (np.float32 or np.float64): working precision, float32 halves the memory
+        chunk_size (int or None): number of frequencies convolved at once, None picks it
+            from memory_budget
+        memory_budget (float): approximate number of bytes used by the convolution buffers.
+            Epochs are also split into blocks when needed to stay within it
+        n_jobs (int): number of workers used by scipy.fft
+
+    Returns:
+        power (np.ndarray): (n_channels, n_freqs, n_decimated_times)
+        itc (np.ndarray): same shape as power, only if return_itc is True
+    """
+    dtype = np.dtype(dtype)
+    if dtype not in (np.float32, np.float64):
+        raise ValueError('dtype must be float32 or float64, got %s' % dtype)
+
+    data = np.asarray(data)
+    if data.ndim != 3:
+        raise ValueError('data must be of shape (n_epochs, n_channels, n_times)')
+    n_epochs, n_channels, n_times = data.shape
+
+    freqs = np.atleast_1d(np.asarray(freqs, dtype=float))
+    key = (float(sfreq), tuple(float(f) for f in freqs), _as_cycles(freqs, n_cycles),
+           bool(zero_mean))
+    fft_Ws, widths, fsize = _wavelet_bank_fft(*key, n_times, dtype.type)
+
+    n_freqs = len(freqs)
+    decim = _check_decim(decim)
+    chunk_size, epoch_chunk = _chunk_sizes(n_epochs, n_channels, n_freqs, fsize,
+                                           fft_Ws.itemsize, chunk_size, memory_budget)
+    n_out = len(range(n_times)[decim])
+
+    power = np.zeros((n_channels, n_freqs, n_out), dtype=dtype)
+    # phases are summed across epoch blocks, the magnitude is taken at the end
+    itc = np.zeros((n_channels, n_freqs, n_out), dtype=fft_Ws.dtype) if return_itc else None
+
+    for epoch_start in range(0, n_epochs, epoch_chunk):
+        block = data[epoch_start:epoch_start + epoch_chunk].astype(dtype, copy=False)
+        fft_x = fft(block, fsize, axis=-1, workers=n_jobs)
+        for start in range(0, n_freqs, chunk_size):
+            stop = min(start + chunk_size, n_freqs)
+            # (n_block_epochs, n_channels, chunk, fsize)
+            ret = ifft(fft_x[:, :, np.newaxis, :] * fft_Ws[np.newaxis, np.newaxis, start:stop],
+                       axis=-1, overwrite_x=True, workers=n_jobs)
+
+            for ii in range(stop - start):
+                # Same centering as mne's cwt in 'same' mode
+                offset = (widths[start + ii] - 1) // 2
+                tfr = ret[:, :, ii, offset:offset + n_times][:, :, decim]
+
+                power[:, start + ii] += (tfr.real ** 2 + tfr.imag ** 2).sum(axis=0)
+                if return_itc:
+                    tfr_abs = np.abs(tfr)
+                    tfr_abs[tfr_abs == 0] = 1.
+                    itc[:, start + ii] += (tfr / tfr_abs).sum(axis=0)
+            del ret
+        del fft_x
+
+    power /= n_epochs
+    if return_itc:
+        itc = np.abs(itc).astype(dtype) / n_epochs
+        return power, itc
+    return power
+
+
+def tfr_morlet(inst, freqs, n_cycles, use_fft=False, return_itc=True, decim=1, n_jobs=1,
+               picks=None, zero_mean=True, average=True, output='power', verbose=None, *,
+               dtype=np.float64, chunk_size=None, memory_budget=256e6):
+    """Replacement for mne.time_frequency.tfr_morlet backed by the cached wavelet bank and
+    the batched convolution in morlet_power_itc. Takes the same arguments in the same order,
+    but only computes averaged power (average=True, output='power'). The convolution is
+    always done with FFTs, so use_fft and verbose are ignored.
+
+    Parameters:
+        inst (mne.Epochs or mne.Evoked): data to transform
+        freqs (array-like): frequencies of interest
+        n_cycles (float or array-like): number of cycles, fixed or per frequency
+        use_fft (bool): ignored
+        return_itc (bool): also return the inter-trial coherence, must be False for Evoked
+        decim (int or slice): decimation factor or slice applied to the time axis
+        n_jobs (int or None): number of workers used by scipy.fft
+        picks (str, list or None): channels as accepted by mne, defaults to the good data channels
+        zero_mean (bool): use zero-mean wavelets
+        average (bool): must be True
+        output (str): must be 'power'
+        verbose: ignored
+        dtype (np.float32 or np.float64): working precision
+        chunk_size (int or None): number of frequencies convolved at once
+        memory_budget (float): approximate number of bytes used by the convolution buffers
+
+    Returns:
+        power (mne.time_frequency.AverageTFR)
+        itc (mne.time_frequency.AverageTFR): only if return_itc is True
+    """
+    from mne import Evoked, pick_info
+    from mne.time_frequency import AverageTFR
+    try:
+        from mne._fiff.pick import _picks_to_idx
+    except ImportError:
+        from mne.io.pick import _picks_to_idx
+
+    if not average:
+        raise ValueError('Only average=True is supported, use mne.time_frequency.tfr_morlet '
+                         'for single epoch decompositions')
+    if output != 'power':
+        raise ValueError("Only output='power' is supported, got %r" % (output,))
+
+    if isinstance(inst, Evoked):
+        if return_itc:
+            raise ValueError('return_itc must be False for evoked data')
+        data = inst.data[np.newaxis]
+        nave = inst.nave
+    else:
+        data = inst.get_data()
+        nave = len(data)
+
+    decim = _check_decim(decim)
+    picks = _picks_to_idx(inst.info, picks, 'data', exclude='bads')
+    info = pick_info(inst.info, picks)
+    data = data[:, picks, :]
+    freqs = np.atleast_1d(np.asarray(freqs, dtype=float))
+
+    out = morlet_power_itc(data, info['sfreq'], freqs, n_cycles=n_cycles, zero_mean=zero_mean,
+                           return_itc=return_itc, decim=decim, dtype=dtype,
+                           chunk_size=chunk_size, memory_budget=memory_budget,
+                           n_jobs=n_jobs or 1)
+    times = inst.times[decim].copy()
+
+    if not return_itc:
+        return AverageTFR(info=info, data=out, times=times, freqs=freqs, nave=nave,
+                          method='morlet-power')
+
+    power, itc = out
+    power = AverageTFR(info=info, data=power, times=times, freqs=freqs, nave=nave,
+                       method='morlet-power')
+    itc = AverageTFR(info=info.copy(), data=itc, times=times, freqs=freqs, nave=nave,
+                     method='morlet-itc')
+    return power, itc
@@ -2,9 +2,6 @@ import os
 import socket
 import platform
 from collections import OrderedDict
-import seaborn as sns
-import pandas as pd
-from matplotlib import pyplot as plt
 
 
 SYNTHETIC_CHANNELS = ['T7', 'CP5', 'FC5', 'C3', 'C4', 'FC6', 'CP6', 'T8']
@@ -93,6 +90,12 @@ def plot_conditions(epochs, conditions=OrderedDict(), ci=97.5, n_boot=1000,
         (matplotlib.figure.Figure): figure object
         (list of matplotlib.axes._subplots.AxesSubplot): list of axes
     """
+    # Plotting libraries are imported here so that importing the channel constants and helpers stays headless
+    import numpy as np
+    import pandas as pd
+    import seaborn as sns
+    from matplotlib import pyplot as plt
+
     if isinstance(conditions, dict):
         conditions = OrderedDict(conditions)
 